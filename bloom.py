@@ -0,0 +1,68 @@
+"""Compact Bloom filter for remembering league IDs across crawl runs."""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Iterator
+
+# On-disk header: number of bits, number of hash functions
+_HEADER = struct.Struct("<QI")
+
+
+class BloomFilter:
+    """
+    Probabilistic set of strings using ~1.8 bytes per item at a 0.1% error rate.
+
+    `item in bloom` is never False for an added item, but may be True for an
+    item that was never added (with probability about `error_rate`).
+    """
+
+    def __init__(self, capacity: int = 200_000, error_rate: float = 0.001):
+        num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        self._init(num_bits, num_hashes, bytearray((num_bits + 7) // 8))
+
+    def _init(self, num_bits: int, num_hashes: int, bits: bytearray) -> None:
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self._bits = bits
+        self._lock = threading.Lock()
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: derive all k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str) -> None:
+        """Add an item (safe to call from multiple threads)."""
+        positions = list(self._positions(item))
+        with self._lock:
+            for pos in positions:
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def save(self, path: Path) -> None:
+        """Write the filter to disk atomically."""
+        with self._lock:
+            data = _HEADER.pack(self.num_bits, self.num_hashes) + self._bits
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> BloomFilter:
+        """Read a filter written by save()."""
+        data = path.read_bytes()
+        num_bits, num_hashes = _HEADER.unpack_from(data)
+        bloom = cls.__new__(cls)
+        bloom._init(num_bits, num_hashes, bytearray(data[_HEADER.size:]))
+        return bloom
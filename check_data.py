@@ -1,4 +1,4 @@
-from db import get_connection
+from db import get_connection, search_players
 
 def check_monangai():
     conn = get_connection()
@@ -6,8 +6,7 @@ def check_monangai():
 
     # Find player
     print("Searching for Monangai...")
-    cursor.execute("SELECT player_id, full_name, team, position FROM players WHERE full_name LIKE '%Monangai%'")
-    players = cursor.fetchall()
+    players = search_players("Monangai")
     print(f'Found players: {players}')
 
     if players:
@@ -40,7 +39,6 @@ def check_monangai():
             leagues = cursor.fetchall()
             print(f'Sample Leagues: {leagues}')
 
-    conn.close()
 
 if __name__ == "__main__":
     check_monangai()
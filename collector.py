@@ -3,21 +3,46 @@
 from __future__ import annotations
 
 import json
+import os
+import queue
 import random
+import threading
 from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import Any, Iterable, Iterator
 
+from bloom import BloomFilter
 from db import (
+    begin,
+    commit,
+    get_all_league_ids,
     get_league_count,
     insert_league,
-    insert_roster,
     insert_roster_players,
+    insert_rosters_bulk,
     insert_players_bulk,
-    league_exists,
+    refresh_stats,
+    rollback,
 )
 from sleeper_api import SleeperAPI, extract_playoff_roster_ids
 
 STATE_FILE = Path(__file__).parent / "data" / "crawl_state.json"
+REJECTED_LEAGUES_FILE = Path(__file__).parent / "data" / "rejected_leagues.bloom"
+
+# Save crawl state after this many users, or sooner if the queue grows this much
+SAVE_EVERY_USERS = 200
+SAVE_QUEUE_GROWTH = 500
+
+# Max leagues waiting on the writer thread before process_league blocks
+WRITE_QUEUE_SIZE = 64
+
+# Shared pool for the independent per-league API calls in process_league
+FETCH_WORKERS = 8
+_fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="league-fetch")
+
+# (league row, roster rows, roster player rows) for one league, ready to insert
+LeagueRows = tuple[tuple[Any, ...], list[tuple[Any, ...]], list[tuple[Any, ...]]]
 
 
 def load_crawl_state() -> dict:
@@ -28,20 +53,105 @@ def load_crawl_state() -> dict:
     return {"seen_user_ids": [], "user_queue": []}
 
 
-def save_crawl_state(seen_user_ids: set[str], user_queue: deque[str]) -> None:
-    """Save crawl state to disk for resuming later."""
+def load_rejected_leagues() -> BloomFilter:
+    """Load the filter of leagues earlier crawls rejected for their playoff settings, or start an empty one."""
+    if REJECTED_LEAGUES_FILE.exists():
+        return BloomFilter.load(REJECTED_LEAGUES_FILE)
+    return BloomFilter()
+
+
+def save_crawl_state(
+    seen_user_ids: set[str],
+    user_queue: Iterable[str],
+    rejected_leagues: BloomFilter | None = None,
+) -> None:
+    """Save crawl state (and optionally the rejected-leagues filter) to disk for resuming later."""
     STATE_FILE.parent.mkdir(exist_ok=True)
-    with open(STATE_FILE, "w") as f:
+    # Write to a temp file and swap it in so a crash mid-write can't corrupt the state
+    tmp_path = STATE_FILE.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
         json.dump({
             "seen_user_ids": list(seen_user_ids),
             "user_queue": list(user_queue),
-        }, f)
+        }, f, separators=(",", ":"))
+    os.replace(tmp_path, STATE_FILE)
+
+    if rejected_leagues is not None:
+        rejected_leagues.save(REJECTED_LEAGUES_FILE)
 
 
 def clear_crawl_state() -> None:
     """Clear saved crawl state."""
-    if STATE_FILE.exists():
-        STATE_FILE.unlink()
+    for path in (STATE_FILE, REJECTED_LEAGUES_FILE):
+        if path.exists():
+            path.unlink()
+
+
+def pop_random(items: list[str]) -> str:
+    """Remove and return a random item in O(1) by swapping it to the end first."""
+    idx = random.randrange(len(items))
+    items[idx], items[-1] = items[-1], items[idx]
+    return items.pop()
+
+
+def store_league_rows(rows: LeagueRows) -> None:
+    """Insert one league's rows in a single transaction."""
+    league_row, roster_rows, roster_player_rows = rows
+    begin()
+    try:
+        insert_league(*league_row)
+        insert_rosters_bulk(roster_rows)
+        insert_roster_players(roster_player_rows)
+    except Exception:
+        rollback()
+        raise
+    commit()
+
+
+class LeagueWriter:
+    """
+    Background thread that owns database writes during a crawl.
+
+    process_league() hands finished leagues to put() and moves on to the next
+    API call while this thread stores them, so fsyncs overlap with network time.
+    """
+
+    def __init__(self, maxsize: int = WRITE_QUEUE_SIZE):
+        self._queue: queue.Queue[LeagueRows | None] = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name="league-writer", daemon=True)
+
+    def __enter__(self) -> LeagueWriter:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def put(self, rows: LeagueRows) -> None:
+        """Queue a league for writing, blocking if the writer is behind."""
+        self._queue.put(rows)
+
+    def flush(self) -> None:
+        """Block until every league queued so far has been stored."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Flush all queued leagues and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            rows = self._queue.get()
+            if rows is None:
+                self._queue.task_done()
+                return
+            try:
+                store_league_rows(rows)
+            except Exception as e:
+                print(f"  Failed to store league {rows[0][0]}: {e}")
+            finally:
+                self._queue.task_done()
 
 
 def crawl_and_store_leagues(
@@ -53,6 +163,7 @@ def crawl_and_store_leagues(
     max_leagues_per_user: int = 5,
     shuffle_queue: bool = True,
     skip_existing: bool = True,
+    max_workers: int = 8,
 ) -> int:
     """
     Crawl Sleeper user<->league graph and store league/roster/playoff data.
@@ -66,6 +177,7 @@ def crawl_and_store_leagues(
         max_leagues_per_user: Max leagues to process per user (limits heavy users)
         shuffle_queue: Whether to randomize traversal order
         skip_existing: Skip leagues already in the database
+        max_workers: Number of users crawled concurrently
     
     Returns:
         Number of new leagues processed
@@ -73,8 +185,14 @@ def crawl_and_store_leagues(
     # Load saved state or start fresh
     state = load_crawl_state()
     seen_user_ids: set[str] = set(state["seen_user_ids"])
-    user_q: deque[str] = deque(state["user_queue"])
+    # Shuffled traversal pops random items from a list (swap-and-pop); FIFO pops from a deque
+    user_q: list[str] | deque[str] = list(state["user_queue"]) if shuffle_queue else deque(state["user_queue"])
     seen_leagues: set[str] = set()
+    existing_leagues: set[str] = get_all_league_ids() if skip_existing else set()
+    # Leagues that failed process_league's playoff-settings check in any run;
+    # skipping them saves a get_league round-trip each time they are rediscovered.
+    # Status rejections aren't recorded, since a pre-draft league starts later.
+    rejected_leagues = load_rejected_leagues()
     leagues_processed = 0
 
     # If no saved state, resolve seed usernames to user_ids
@@ -89,14 +207,21 @@ def crawl_and_store_leagues(
 
     print(f"Starting crawl targeting {target_leagues} new leagues...")
 
-    while user_q and leagues_processed < target_leagues and len(seen_user_ids) < max_users_to_visit:
-        if shuffle_queue and len(user_q) > 1:
-            user_q.rotate(random.randint(0, len(user_q) - 1))
+    # Guards seen_user_ids, user_q, seen_leagues and the league counters, which
+    # are shared between the user workers
+    lock = threading.Lock()
+    leagues_in_flight = 0
 
-        user_id = user_q.popleft()
-        if user_id in seen_user_ids:
-            continue
-        seen_user_ids.add(user_id)
+    def enqueue_league_users(league_id: str) -> None:
+        league_users = api.get_league_users(league_id)
+        with lock:
+            for u in league_users:
+                u_id = u.get("user_id")
+                if u_id and u_id not in seen_user_ids:
+                    user_q.append(u_id)
+
+    def process_user(user_id: str) -> None:
+        nonlocal leagues_processed, leagues_in_flight
 
         # Get user's leagues (API accepts user_id directly)
         leagues = api.get_user_leagues(user_id, season)
@@ -105,56 +230,115 @@ def crawl_and_store_leagues(
         leagues_from_this_user = 0
         for lg in leagues:
             league_id = str(lg.get("league_id", ""))
-            if not league_id or league_id in seen_leagues:
-                continue
 
             # Filter non-NFL
-            if lg.get("sport") != "nfl":
+            if not league_id or lg.get("sport") != "nfl":
                 continue
 
-            seen_leagues.add(league_id)
+            with lock:
+                if leagues_processed + leagues_in_flight >= target_leagues:
+                    break
+                if league_id in seen_leagues:
+                    continue
+                seen_leagues.add(league_id)
+                rejected = skip_existing and league_id in rejected_leagues
+                existing = league_id in existing_leagues
+                if not rejected and not existing:
+                    # Hold a slot while processing, reserved under the same lock
+                    # as the target check so workers can't overshoot the target
+                    leagues_in_flight += 1
+
+            if rejected:
+                continue
 
             # Skip if already in DB
-            if skip_existing and league_exists(league_id):
+            if existing:
                 # Still enqueue users from existing leagues for discovery
-                league_users = api.get_league_users(league_id)
-                for u in league_users:
-                    u_id = u.get("user_id")
-                    if u_id and u_id not in seen_user_ids:
-                        user_q.append(u_id)
+                enqueue_league_users(league_id)
                 continue
 
             # Process this league
-            success = process_league(api, league_id, season)
+            success = False
+            try:
+                success = process_league(api, league_id, season, writer, rejected_leagues)
+            finally:
+                with lock:
+                    leagues_in_flight -= 1
+                    if success:
+                        leagues_processed += 1
+
             if success:
-                leagues_processed += 1
                 leagues_from_this_user += 1
                 # Enqueue league users for further crawling
-                league_users = api.get_league_users(league_id)
-                for u in league_users:
-                    u_id = u.get("user_id")
-                    if u_id and u_id not in seen_user_ids:
-                        user_q.append(u_id)
+                enqueue_league_users(league_id)
 
-            if leagues_processed >= target_leagues:
-                break
             if leagues_from_this_user >= max_leagues_per_user:
                 break
 
-        # Save state periodically (every 10 users)
-        if len(seen_user_ids) % 10 == 0:
-            save_crawl_state(seen_user_ids, user_q)
+    with LeagueWriter() as writer, ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crawl-user") as pool:
+        # user_id of each submitted user; they are marked seen on submit but
+        # only count as visited in saved state once their future completes
+        pending: dict[Future[None], str] = {}
+        users_since_save = 0
+        queue_at_save = len(user_q)
+        while True:
+            # Keep up to max_workers users in flight
+            with lock:
+                while (
+                    user_q
+                    and len(pending) < max_workers
+                    and leagues_processed < target_leagues
+                    and len(seen_user_ids) < max_users_to_visit
+                ):
+                    user_id = pop_random(user_q) if shuffle_queue else user_q.popleft()
+                    if user_id in seen_user_ids:
+                        continue
+                    seen_user_ids.add(user_id)
+                    pending[pool.submit(process_user, user_id)] = user_id
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                future.result()
+
+            # Save state periodically; snapshot under the lock, write outside it.
+            # Users still in flight go back in the saved queue so a resumed
+            # crawl revisits them, and their finished leagues must be stored
+            # before the state claims the users were visited.
+            users_since_save += len(done)
+            if users_since_save >= SAVE_EVERY_USERS or len(user_q) - queue_at_save > SAVE_QUEUE_GROWTH:
+                with lock:
+                    in_flight = list(pending.values())
+                    snapshot = (seen_user_ids.difference(in_flight), list(user_q) + in_flight)
+                writer.flush()
+                save_crawl_state(*snapshot, rejected_leagues)
+                users_since_save = 0
+                queue_at_save = len(snapshot[1])
 
     # Save state for resuming later
-    save_crawl_state(seen_user_ids, user_q)
+    save_crawl_state(seen_user_ids, user_q, rejected_leagues)
+    refresh_stats()
     print(f"Crawl complete. Processed {leagues_processed} new leagues, visited {len(seen_user_ids)} users.")
     print(f"State saved. {len(user_q)} users remaining in queue.")
     return leagues_processed
 
 
-def process_league(api: SleeperAPI, league_id: str, season: int) -> bool:
+def process_league(
+    api: SleeperAPI,
+    league_id: str,
+    season: int,
+    writer: LeagueWriter | None = None,
+    rejected: BloomFilter | None = None,
+) -> bool:
     """
     Process a single league: fetch details, rosters, and playoff bracket.
+
+    Rows are handed to `writer` if given, otherwise stored immediately.
+    Leagues rejected for their playoff settings, which don't change, are
+    added to `rejected`; leagues that haven't drafted yet are not.
     
     Returns True if successfully processed.
     """
@@ -175,42 +359,41 @@ def process_league(api: SleeperAPI, league_id: str, season: int) -> bool:
 
     # Skip leagues where >67% of teams make playoffs (unusual settings)
     if total_rosters > 0 and playoff_teams / total_rosters > 0.67:
+        if rejected is not None:
+            rejected.add(league_id)
         return False
 
-    insert_league(
-        league_id=league_id,
-        season=str(season),
-        name=league.get("name"),
-        total_rosters=league.get("total_rosters"),
-        playoff_teams=playoff_teams,
-        status=status,
-    )
-
-    # Get rosters
-    rosters = api.get_league_rosters(league_id)
-    if not rosters:
-        return False
-
-    # Get winners bracket to determine playoff teams
-    bracket = api.get_winners_bracket(league_id)
+    # Get rosters and the winners bracket (to determine playoff teams) concurrently
+    rosters_future = _fetch_pool.submit(api.get_league_rosters, league_id)
+    bracket_future = _fetch_pool.submit(api.get_winners_bracket, league_id)
+    # Sleeper answers JSON null for a league without rosters
+    rosters = rosters_future.result() or []
+    bracket = bracket_future.result() if rosters else []
     playoff_roster_ids = extract_playoff_roster_ids(bracket)
 
-    # Store rosters and their players
+    league_row = (league_id, str(season), league.get("name"), league.get("total_rosters"), playoff_teams, status)
+    roster_rows = []
+    roster_player_rows = []
     for roster in rosters:
         roster_id = roster.get("roster_id")
         if roster_id is None:
             continue
 
-        owner_id = roster.get("owner_id")
-        players = roster.get("players") or []
-
         # Determine if this roster made playoffs
         made_playoffs = roster_id in playoff_roster_ids if playoff_roster_ids else None
 
-        insert_roster(league_id, roster_id, owner_id, made_playoffs)
-        insert_roster_players(league_id, roster_id, players)
+        roster_rows.append((league_id, roster_id, roster.get("owner_id"), made_playoffs))
+        roster_player_rows.extend(
+            (league_id, roster_id, pid, made_playoffs) for pid in roster.get("players") or []
+        )
 
-    return True
+    rows = (league_row, roster_rows, roster_player_rows)
+    if writer is not None:
+        writer.put(rows)
+    else:
+        store_league_rows(rows)
+
+    return bool(rosters)
 
 
 def load_player_cache(api: SleeperAPI, force_refresh: bool = False) -> int:
@@ -221,26 +404,27 @@ def load_player_cache(api: SleeperAPI, force_refresh: bool = False) -> int:
     """
     players_dict = api.get_all_players(force_refresh=force_refresh)
 
-    # Convert to list of dicts for bulk insert
-    players_list = []
-    for player_id, data in players_dict.items():
-        # Build full name
-        first = data.get("first_name", "")
-        last = data.get("last_name", "")
-        full_name = f"{first} {last}".strip() if first or last else None
-
-        # Get primary position
-        positions = data.get("fantasy_positions") or []
-        position = positions[0] if positions else data.get("position")
-
-        players_list.append({
-            "player_id": player_id,
-            "full_name": full_name,
-            "position": position,
-            "team": data.get("team"),
-        })
-
-    insert_players_bulk(players_list)
-    print(f"Loaded {len(players_list)} players into database.")
-    return len(players_list)
-
+    def player_rows() -> Iterator[tuple[str, str | None, str | None, str | None]]:
+        # Yield rows straight into executemany instead of building a list first
+        for player_id, data in players_dict.items():
+            # Build full name
+            first = data.get("first_name", "")
+            last = data.get("last_name", "")
+            full_name = f"{first} {last}".strip() if first or last else None
+
+            # Get primary position
+            positions = data.get("fantasy_positions") or []
+            position = positions[0] if positions else data.get("position")
+
+            yield (player_id, full_name, position, data.get("team"))
+
+    begin()
+    try:
+        insert_players_bulk(player_rows())
+    except Exception:
+        rollback()
+        raise
+    commit()
+    refresh_stats()
+    print(f"Loaded {len(players_dict)} players into database.")
+    return len(players_dict)
@@ -4,18 +4,46 @@ from __future__ import annotations
 
 import sqlite3
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
 DATA_DIR = Path(__file__).parent / "data"
 DB_PATH = DATA_DIR / "playoff_odds.db"
 
+# Shared connection, opened lazily by get_connection(). Runs in autocommit mode;
+# callers group writes with begin()/commit(). Rows are plain tuples unless the
+# cursor comes from dict_cursor().
+_CONN: sqlite3.Connection | None = None
+
 
 def get_connection() -> sqlite3.Connection:
-    """Get a connection to the database, creating it if necessary."""
-    DATA_DIR.mkdir(exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get the shared database connection, creating the database if necessary."""
+    global _CONN
+    if _CONN is None:
+        DATA_DIR.mkdir(exist_ok=True)
+        _CONN = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
+    return _CONN
+
+
+def dict_cursor(conn: sqlite3.Connection) -> sqlite3.Cursor:
+    """Get a cursor whose rows can be accessed by column name."""
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    return cursor
+
+
+def begin() -> None:
+    """Start a transaction on the shared connection."""
+    get_connection().execute("BEGIN")
+
+
+def commit() -> None:
+    """Commit the current transaction on the shared connection."""
+    get_connection().execute("COMMIT")
+
+
+def rollback() -> None:
+    """Roll back the current transaction on the shared connection."""
+    get_connection().execute("ROLLBACK")
 
 
 def init_db() -> None:
@@ -23,6 +51,17 @@ def init_db() -> None:
     conn = get_connection()
     cursor = conn.cursor()
 
+    # WAL lets export reads run alongside collector writes; NORMAL sync only
+    # fsyncs at checkpoints, which is safe in WAL mode.
+    cursor.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-65536;
+        PRAGMA mmap_size=268435456;
+        PRAGMA wal_autocheckpoint=4000;
+    """)
+
     cursor.executescript("""
         CREATE TABLE IF NOT EXISTS leagues (
             league_id TEXT PRIMARY KEY,
@@ -46,6 +85,7 @@ def init_db() -> None:
             league_id TEXT NOT NULL,
             roster_id INTEGER NOT NULL,
             player_id TEXT NOT NULL,
+            made_playoffs INTEGER,  -- copy of rosters.made_playoffs, so odds skip the join
             PRIMARY KEY (league_id, roster_id, player_id),
             FOREIGN KEY (league_id, roster_id) REFERENCES rosters(league_id, roster_id)
         );
@@ -57,62 +97,120 @@ def init_db() -> None:
             team TEXT
         );
 
-        CREATE INDEX IF NOT EXISTS idx_roster_players_player ON roster_players(player_id);
         CREATE INDEX IF NOT EXISTS idx_rosters_made_playoffs ON rosters(made_playoffs);
     """)
 
-    conn.commit()
-    conn.close()
+    # Databases created before roster_players.made_playoffs existed: add and backfill it
+    cursor.execute("SELECT 1 FROM pragma_table_info('roster_players') WHERE name = 'made_playoffs'")
+    if cursor.fetchone() is None:
+        cursor.executescript("""
+            BEGIN;
+            ALTER TABLE roster_players ADD COLUMN made_playoffs INTEGER;
+            UPDATE roster_players SET made_playoffs = (
+                SELECT r.made_playoffs FROM rosters r
+                WHERE r.league_id = roster_players.league_id AND r.roster_id = roster_players.roster_id
+            );
+            COMMIT;
+        """)
+
+    # Covering index for the per-player odds aggregation, which now reads
+    # roster_players alone; it supersedes the player_id-only index
+    cursor.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_rp_player_playoffs ON roster_players(player_id, made_playoffs);
+        DROP INDEX IF EXISTS idx_roster_players_player;
+    """)
+
+    # Full-text index over player names, kept in sync with `players` by triggers
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'players_fts'")
+    fts_exists = cursor.fetchone() is not None
+    cursor.executescript("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS players_fts USING fts5(
+            full_name, content='players', content_rowid='rowid'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS players_ai AFTER INSERT ON players BEGIN
+            INSERT INTO players_fts(rowid, full_name) VALUES (new.rowid, new.full_name);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS players_ad AFTER DELETE ON players BEGIN
+            INSERT INTO players_fts(players_fts, rowid, full_name) VALUES ('delete', old.rowid, old.full_name);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS players_au AFTER UPDATE ON players BEGIN
+            INSERT INTO players_fts(players_fts, rowid, full_name) VALUES ('delete', old.rowid, old.full_name);
+            INSERT INTO players_fts(rowid, full_name) VALUES (new.rowid, new.full_name);
+        END;
+    """)
+    if not fts_exists:
+        # Index players loaded before the FTS table existed
+        cursor.execute("INSERT INTO players_fts(players_fts) VALUES ('rebuild')")
+
+
+def refresh_stats() -> None:
+    """
+    Recompute the query planner's table statistics. Call after bulk writes:
+    stats gathered at startup would describe empty or outdated tables.
+    """
+    # analysis_limit samples each index instead of scanning it, keeping this quick on large databases
+    get_connection().executescript("""
+        PRAGMA analysis_limit=1000;
+        ANALYZE;
+    """)
+
+
+# Insert statements for the write path. Kept as module constants so every call
+# passes the identical string and hits the connection's prepared-statement cache.
+_SQL_INSERT_LEAGUE = """INSERT OR REPLACE INTO leagues (league_id, season, name, total_rosters, playoff_teams, status)
+           VALUES (?, ?, ?, ?, ?, ?)"""
+
+_SQL_INSERT_ROSTER = """INSERT OR REPLACE INTO rosters (league_id, roster_id, owner_id, made_playoffs)
+           VALUES (?, ?, ?, ?)"""
+
+_SQL_INSERT_ROSTER_PLAYER = """INSERT INTO roster_players (league_id, roster_id, player_id, made_playoffs)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(league_id, roster_id, player_id) DO UPDATE SET
+               made_playoffs = excluded.made_playoffs"""
+
+# Upsert rather than INSERT OR REPLACE: REPLACE deletes without firing the
+# players_ad trigger, which would leave stale rows in players_fts
+_SQL_UPSERT_PLAYER = """INSERT INTO players (player_id, full_name, position, team)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(player_id) DO UPDATE SET
+               full_name = excluded.full_name,
+               position = excluded.position,
+               team = excluded.team"""
 
 
 def insert_league(league_id: str, season: str, name: str | None, total_rosters: int | None, 
                   playoff_teams: int | None, status: str | None) -> None:
     """Insert or replace a league record."""
     conn = get_connection()
-    conn.execute(
-        """INSERT OR REPLACE INTO leagues (league_id, season, name, total_rosters, playoff_teams, status)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (league_id, season, name, total_rosters, playoff_teams, status)
-    )
-    conn.commit()
-    conn.close()
+    conn.execute(_SQL_INSERT_LEAGUE, (league_id, season, name, total_rosters, playoff_teams, status))
 
 
 def insert_roster(league_id: str, roster_id: int, owner_id: str | None, made_playoffs: bool | None) -> None:
     """Insert or replace a roster record."""
     conn = get_connection()
     made_playoffs_int = None if made_playoffs is None else (1 if made_playoffs else 0)
-    conn.execute(
-        """INSERT OR REPLACE INTO rosters (league_id, roster_id, owner_id, made_playoffs)
-           VALUES (?, ?, ?, ?)""",
-        (league_id, roster_id, owner_id, made_playoffs_int)
-    )
-    conn.commit()
-    conn.close()
+    conn.execute(_SQL_INSERT_ROSTER, (league_id, roster_id, owner_id, made_playoffs_int))
 
 
-def insert_roster_players(league_id: str, roster_id: int, player_ids: list[str]) -> None:
-    """Insert player IDs for a roster (bulk insert)."""
+def insert_rosters_bulk(rows: list[tuple[str, int, str | None, bool | None]]) -> None:
+    """Insert or replace (league_id, roster_id, owner_id, made_playoffs) roster rows."""
     conn = get_connection()
-    conn.executemany(
-        """INSERT OR IGNORE INTO roster_players (league_id, roster_id, player_id)
-           VALUES (?, ?, ?)""",
-        [(league_id, roster_id, pid) for pid in player_ids]
-    )
-    conn.commit()
-    conn.close()
+    conn.executemany(_SQL_INSERT_ROSTER, rows)
 
 
-def insert_players_bulk(players: list[dict[str, Any]]) -> None:
-    """Bulk insert player records."""
+def insert_roster_players(rows: list[tuple[str, int, str, bool | None]]) -> None:
+    """Insert (league_id, roster_id, player_id, made_playoffs) rows, across any number of rosters."""
     conn = get_connection()
-    conn.executemany(
-        """INSERT OR REPLACE INTO players (player_id, full_name, position, team)
-           VALUES (?, ?, ?, ?)""",
-        [(p["player_id"], p.get("full_name"), p.get("position"), p.get("team")) for p in players]
-    )
-    conn.commit()
-    conn.close()
+    conn.executemany(_SQL_INSERT_ROSTER_PLAYER, rows)
+
+
+def insert_players_bulk(rows: Iterable[tuple[str, str | None, str | None, str | None]]) -> None:
+    """Bulk insert or update (player_id, full_name, position, team) rows; any iterable works."""
+    conn = get_connection()
+    conn.executemany(_SQL_UPSERT_PLAYER, rows)
 
 
 def get_playoff_odds(player_id: str) -> dict[str, Any]:
@@ -127,7 +225,7 @@ def get_playoff_odds(player_id: str) -> dict[str, Any]:
         - playoff_pct: percentage that made playoffs
     """
     conn = get_connection()
-    cursor = conn.cursor()
+    cursor = dict_cursor(conn)
 
     # Get player info
     cursor.execute("SELECT full_name, position, team FROM players WHERE player_id = ?", (player_id,))
@@ -137,15 +235,13 @@ def get_playoff_odds(player_id: str) -> dict[str, Any]:
     cursor.execute("""
         SELECT 
             COUNT(*) as total_rosters,
-            SUM(CASE WHEN r.made_playoffs = 1 THEN 1 ELSE 0 END) as playoff_rosters
-        FROM roster_players rp
-        JOIN rosters r ON rp.league_id = r.league_id AND rp.roster_id = r.roster_id
-        WHERE rp.player_id = ?
-          AND r.made_playoffs IS NOT NULL
+            SUM(made_playoffs) as playoff_rosters
+        FROM roster_players
+        WHERE player_id = ?
+          AND made_playoffs IS NOT NULL
     """, (player_id,))
     
     counts = cursor.fetchone()
-    conn.close()
 
     total = counts["total_rosters"] or 0
     playoffs = counts["playoff_rosters"] or 0
@@ -163,19 +259,24 @@ def get_playoff_odds(player_id: str) -> dict[str, Any]:
 
 
 def search_players(query: str, limit: int = 20) -> list[dict[str, Any]]:
-    """Search for players by name (case-insensitive partial match)."""
+    """Search for players by name (case-insensitive prefix match on each word)."""
+    # Quote each word so punctuation in names isn't parsed as FTS5 syntax
+    terms = ['"' + word.replace('"', '""') + '"*' for word in query.split()]
+    if not terms:
+        return []
+
     conn = get_connection()
-    cursor = conn.cursor()
+    cursor = dict_cursor(conn)
     cursor.execute(
-        """SELECT player_id, full_name, position, team 
-           FROM players 
-           WHERE full_name LIKE ? 
-           ORDER BY full_name
+        """SELECT p.player_id, p.full_name, p.position, p.team 
+           FROM players_fts f
+           JOIN players p ON p.rowid = f.rowid
+           WHERE players_fts MATCH ? 
+           ORDER BY p.full_name
            LIMIT ?""",
-        (f"%{query}%", limit)
+        (" ".join(terms), limit)
     )
     results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
     return results
 
 
@@ -185,7 +286,6 @@ def get_league_count() -> int:
     cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM leagues")
     count = cursor.fetchone()[0]
-    conn.close()
     return count
 
 
@@ -195,16 +295,20 @@ def get_roster_count() -> int:
     cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM rosters WHERE made_playoffs IS NOT NULL")
     count = cursor.fetchone()[0]
-    conn.close()
     return count
 
 
+def get_all_league_ids() -> set[str]:
+    """Get the IDs of every league in the database."""
+    conn = get_connection()
+    return {row[0] for row in conn.execute("SELECT league_id FROM leagues")}
+
+
 def league_exists(league_id: str) -> bool:
     """Check if a league already exists in the database."""
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT 1 FROM leagues WHERE league_id = ?", (league_id,))
     exists = cursor.fetchone() is not None
-    conn.close()
     return exists
 
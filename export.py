@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import gzip
 import json
 from pathlib import Path
 
@@ -9,16 +10,18 @@ from db import get_connection, init_db
 
 VALID_POSITIONS = {"QB", "RB", "WR", "TE", "K", "DEF"}
 
+# Marker in template.html's loadData() that generate_standalone_html fills in
+EMBEDDED_DATA_PLACEHOLDER = "/*__EMBEDDED_DATA__*/null"
 
-def export_all_player_odds(min_roster_pct: float = 1.0) -> list[dict]:
+
+def load_player_totals() -> tuple[int, list[dict]]:
     """
-    Export playoff odds for all players with sufficient sample size.
-    
-    Args:
-        min_roster_pct: Minimum % of rosters a player must be on to include
-        
-    Returns:
-        List of player dicts with playoff odds
+    Aggregate playoff odds for every player in one pass over roster_players,
+    which carries made_playoffs itself (no join to rosters).
+
+    Returns (total rosters with playoff data, player dicts sorted by playoff
+    rate). Pass the result to export_all_player_odds(totals=...) to try many
+    min_roster_pct thresholds without re-scanning SQLite.
     """
     conn = get_connection()
     cursor = conn.cursor()
@@ -26,46 +29,54 @@ def export_all_player_odds(min_roster_pct: float = 1.0) -> list[dict]:
     # Get total roster count first
     cursor.execute("SELECT COUNT(*) FROM rosters WHERE made_playoffs IS NOT NULL")
     total_rosters_in_db = cursor.fetchone()[0]
-    min_rosters = int(total_rosters_in_db * min_roster_pct / 100)
 
+    # Percentages are computed in SQL so rows map straight onto output dicts.
+    # The per-player counts come from roster_players alone (made_playoffs is
+    # denormalized onto it), so only the small players table is joined.
     cursor.execute("""
         SELECT 
             p.player_id,
-            p.full_name,
+            COALESCE(p.full_name, p.player_id) as name,
             p.position,
-            p.team,
-            COUNT(*) as total_rosters,
-            SUM(CASE WHEN r.made_playoffs = 1 THEN 1 ELSE 0 END) as playoff_rosters
-        FROM players p
-        JOIN roster_players rp ON p.player_id = rp.player_id
-        JOIN rosters r ON rp.league_id = r.league_id AND rp.roster_id = r.roster_id
-        WHERE r.made_playoffs IS NOT NULL
-          AND p.position IN ('QB', 'RB', 'WR', 'TE', 'K', 'DEF')
-        GROUP BY p.player_id
-        HAVING COUNT(*) >= ?
-        ORDER BY playoff_rosters * 1.0 / COUNT(*) DESC
-    """, (min_rosters,))
-
-    results = []
-    for row in cursor.fetchall():
-        total = row["total_rosters"]
-        playoffs = row["playoff_rosters"]
-        pct = round(playoffs / total * 100, 2) if total > 0 else 0
-        ownership_pct = round(total / total_rosters_in_db * 100, 1)
-
-        results.append({
-            "player_id": row["player_id"],
-            "name": row["full_name"] or row["player_id"],
-            "position": row["position"],
-            "team": row["team"] or "FA",
-            "total_rosters": total,
-            "playoff_rosters": playoffs,
-            "playoff_pct": pct,
-            "ownership_pct": ownership_pct,
-        })
-
-    conn.close()
-    return results
+            COALESCE(p.team, 'FA') as team,
+            rp.total_rosters,
+            rp.playoff_rosters,
+            ROUND(rp.playoff_rosters * 100.0 / rp.total_rosters, 2) as playoff_pct,
+            ROUND(rp.total_rosters * 100.0 / ?, 1) as ownership_pct
+        FROM (
+            SELECT player_id, COUNT(*) as total_rosters, SUM(made_playoffs) as playoff_rosters
+            FROM roster_players
+            WHERE made_playoffs IS NOT NULL
+            GROUP BY player_id
+        ) rp
+        JOIN players p ON p.player_id = rp.player_id
+        WHERE p.position IN ('QB', 'RB', 'WR', 'TE', 'K', 'DEF')
+        ORDER BY rp.playoff_rosters * 1.0 / rp.total_rosters DESC
+    """, (total_rosters_in_db,))
+
+    # Plain tuple rows zipped with the column names; no sqlite3.Row per player
+    columns = [col[0] for col in cursor.description]
+    players = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    return total_rosters_in_db, players
+
+
+def export_all_player_odds(
+    min_roster_pct: float = 1.0,
+    totals: tuple[int, list[dict]] | None = None,
+) -> list[dict]:
+    """
+    Export playoff odds for all players with sufficient sample size.
+    
+    Args:
+        min_roster_pct: Minimum % of rosters a player must be on to include
+        totals: Result of load_player_totals() to reuse; loaded fresh if omitted
+        
+    Returns:
+        List of player dicts with playoff odds
+    """
+    total_rosters_in_db, players = totals if totals is not None else load_player_totals()
+    min_rosters = int(total_rosters_in_db * min_roster_pct / 100)
+    return [p for p in players if p["total_rosters"] >= min_rosters]
 
 
 def get_baseline_playoff_rate() -> float:
@@ -77,7 +88,6 @@ def get_baseline_playoff_rate() -> float:
         FROM rosters WHERE made_playoffs IS NOT NULL
     """)
     rate = cursor.fetchone()[0] or 0
-    conn.close()
     return round(rate, 2)
 
 
@@ -92,34 +102,18 @@ def get_stats() -> dict:
     cursor.execute("SELECT COUNT(*) FROM rosters WHERE made_playoffs IS NOT NULL")
     rosters = cursor.fetchone()[0]
     
-    conn.close()
     return {"leagues": leagues, "rosters": rosters}
 
 
-def generate_standalone_html(output_path: Path, data: dict) -> None:
-    """Generate a standalone HTML file with embedded data."""
+def generate_standalone_html(output_path: Path, data_json: str) -> None:
+    """Generate a standalone HTML file with embedded (already serialized) data."""
     template_path = Path(__file__).parent / "template.html"
+    html = template_path.read_text()
     
-    with open(template_path) as f:
-        html = f.read()
-    
-    # Replace the fetch call with embedded data
-    data_json = json.dumps(data)
-    
-    # Replace the loadData function to use embedded data
-    old_load = """async function loadData() {
-            try {
-                const resp = await fetch('data/export.json');
-                const data = await resp.json();"""
+    # Swap the placeholder in loadData() for the data literal
+    html = html.replace(EMBEDDED_DATA_PLACEHOLDER, data_json, 1)
     
-    new_load = f"""async function loadData() {{
-            try {{
-                const data = {data_json};"""
-    
-    html = html.replace(old_load, new_load)
-    
-    with open(output_path, "w") as f:
-        f.write(html)
+    output_path.write_text(html)
 
 
 if __name__ == "__main__":
@@ -140,13 +134,19 @@ if __name__ == "__main__":
         "players": players,
     }
     
+    # Serialize once; the same payload is embedded in the standalone HTML
+    payload = json.dumps(output, separators=(",", ":"))
     output_path = Path(__file__).parent / "data" / "export.json"
-    with open(output_path, "w") as f:
-        json.dump(output, f)
+    output_path.write_text(payload)
     print(f"Saved JSON to {output_path}")
     
+    # Gzipped copy for the web client, which decompresses it in the browser
+    gz_path = output_path.with_suffix(".json.gz")
+    gz_path.write_bytes(gzip.compress(payload.encode(), compresslevel=6, mtime=0))
+    print(f"Saved gzipped JSON to {gz_path}")
+    
     # Generate standalone HTML
     html_path = Path(__file__).parent / "index.html"
-    generate_standalone_html(html_path, output)
+    generate_standalone_html(html_path, payload)
     print(f"Saved standalone HTML to {html_path}")
 
@@ -0,0 +1,63 @@
+"""SQLite-backed cache of HTTP response bodies."""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class ResponseCache:
+    """
+    Response bodies keyed by URL, kept in their own SQLite file.
+
+    Entries record when they were stored and each lookup passes the oldest
+    age it will accept, so endpoints with different TTLs share one cache.
+    Safe to use from multiple threads.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                stored_at REAL NOT NULL,  -- unix time
+                body BLOB NOT NULL
+            );
+        """)
+
+    def get(self, url: str, max_age: float) -> bytes | None:
+        """Get the cached body for `url`, or None if missing or older than `max_age` seconds."""
+        with self._lock:
+            row = self._conn.execute("SELECT stored_at, body FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None or time.time() - row[0] >= max_age:
+            return None
+        return row[1]
+
+    def set(self, url: str, body: bytes) -> None:
+        """Store (or replace) the body for `url`."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, stored_at, body) VALUES (?, ?, ?)",
+                (url, time.time(), body),
+            )
+
+    def delete(self, url: str) -> None:
+        """Drop the cached body for `url`, if any."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+
+    def prune(self, max_age: float) -> None:
+        """Drop every entry older than `max_age` seconds."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - max_age,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -3,10 +3,12 @@
 from __future__ import annotations
 
 import argparse
+import logging
 
 from db import init_db, get_playoff_odds, search_players, get_league_count, get_roster_count
-from sleeper_api import SleeperAPI
-from collector import crawl_and_store_leagues, load_player_cache, clear_crawl_state
+
+# sleeper_api and collector pull in requests/urllib3, so they are imported
+# inside the commands that talk to Sleeper; init/odds/stats start faster.
 
 
 def cmd_init(args: argparse.Namespace) -> None:
@@ -17,31 +19,36 @@ def cmd_init(args: argparse.Namespace) -> None:
 
 def cmd_load_players(args: argparse.Namespace) -> None:
     """Load player data from Sleeper API."""
+    from collector import load_player_cache
+    from sleeper_api import SleeperAPI
+
     init_db()
-    api = SleeperAPI()
-    load_player_cache(api, force_refresh=args.force)
+    with SleeperAPI() as api:
+        load_player_cache(api, force_refresh=args.force)
 
 
 def cmd_crawl(args: argparse.Namespace) -> None:
     """Crawl leagues starting from seed usernames."""
+    from collector import clear_crawl_state, crawl_and_store_leagues, load_player_cache
+    from sleeper_api import SleeperAPI
+
     init_db()
     
     if args.reset:
         clear_crawl_state()
         print("Cleared crawl state. Starting fresh.")
     
-    api = SleeperAPI()
+    with SleeperAPI() as api:
+        # Load players first if not already loaded
+        load_player_cache(api)
 
-    # Load players first if not already loaded
-    load_player_cache(api)
-
-    crawl_and_store_leagues(
-        api=api,
-        seed_usernames=args.seeds,
-        season=args.season,
-        target_leagues=args.target,
-        skip_existing=not args.force,
-    )
+        crawl_and_store_leagues(
+            api=api,
+            seed_usernames=args.seeds,
+            season=args.season,
+            target_leagues=args.target,
+            skip_existing=not args.force,
+        )
 
 
 def cmd_odds(args: argparse.Namespace) -> None:
@@ -127,6 +134,9 @@ def main() -> None:
 
     args = parser.parse_args()
 
+    # Library modules log progress; show it as plain lines like the CLI's own output
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     commands = {
         "init": cmd_init,
         "load-players": cmd_load_players,
@@ -2,50 +2,260 @@
 
 from __future__ import annotations
 
+import gzip
 import json
+import logging
+import os
+import pickle
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from http_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
 
 BASE = "https://api.sleeper.app/v1"
 DATA_DIR = Path(__file__).parent / "data"
-PLAYERS_CACHE_PATH = DATA_DIR / "players.json"
+PLAYERS_CACHE_PATH = DATA_DIR / "players.pickle"
+LEGACY_PLAYERS_CACHE_PATH = DATA_DIR / "players.json"  # old JSON cache, deleted on the next fetch
+PLAYERS_RAW_CACHE_PATH = DATA_DIR / "players_raw.json.gz"
+PLAYERS_CACHE_TTL = 24 * 60 * 60  # seconds
+HTTP_CACHE_PATH = DATA_DIR / "http_cache.sqlite"
+
+# How long responses are reused, by endpoint suffix (seconds). Endpoints not
+# listed here are always fetched.
+HTTP_CACHE_TTLS = {
+    "/rosters": 60 * 60,
+    "/winners_bracket": 5 * 60,
+    "/users": 24 * 60 * 60,
+}
+
+# The players cache keeps only these fields per player (Sleeper sends ~40).
+# Bump PLAYERS_SCHEMA_VERSION whenever PLAYER_FIELDS changes so old caches are refetched.
+PLAYER_FIELDS = ("first_name", "last_name", "fantasy_positions", "position", "team", "injury_status")
+PLAYERS_SCHEMA_VERSION = 2
+
+# Rate limiting: Sleeper allows 1000 calls/min. A token bucket refills at
+# RATE_LIMIT_CALLS per RATE_LIMIT_PERIOD and holds up to RATE_LIMIT_BURST
+# tokens, so back-to-back calls after an idle spell go out immediately while
+# any 60s window still stays within 900 + 100 = 1000 calls.
+RATE_LIMIT_CALLS = 900
+RATE_LIMIT_PERIOD = 60  # seconds
+RATE_LIMIT_BURST = 100
 
-# Rate limiting: stay under 1000 calls/min (~0.06s min between calls)
-# Using 0.05s gives ~1200 calls/min theoretical max, but real throughput is lower
-DEFAULT_SLEEP = 0.05
+# In-process memo for get_user/get_league: entries live MEMO_TTL seconds,
+# at most MEMO_SIZE are kept (least recently used dropped first)
+MEMO_TTL = 5 * 60
+MEMO_SIZE = 256
+
+# Threads used by map_get and the get_many_* helpers
+MAP_WORKERS = 16
+
+# Responses _get retries (honouring Retry-After), and how many tries in total
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 5
 
 
 class SleeperAPI:
     """Client for the Sleeper API with built-in rate limiting."""
 
-    def __init__(self, sleep_s: float = DEFAULT_SLEEP):
-        self.sleep_s = sleep_s
-        self._last_call_time: float = 0
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_CALLS / RATE_LIMIT_PERIOD,
+        capacity: float = RATE_LIMIT_BURST,
+        cache_path: Path | None = HTTP_CACHE_PATH,
+    ):
+        # Token bucket: `rate` tokens/sec, at most `capacity` banked
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._rate_lock = threading.Lock()
+
+        # Keep-alive connection pool so each call doesn't pay a new TLS handshake.
+        # Only one host is used; pool_maxsize covers the crawl's concurrent threads,
+        # and pool_block makes any extra thread wait for a warm connection instead
+        # of opening a one-off socket that is thrown away after a single request.
+        # The adapter only retries connection errors; _request handles 429/5xx
+        # itself so it can also drain the token bucket. urllib3 would otherwise
+        # still retry 413/429/503 responses that carry Retry-After on its own.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(),
+                respect_retry_after_header=False,
+                allowed_methods=["GET"],
+            ),
+            pool_connections=4,
+            pool_maxsize=32,
+            pool_block=True,
+        )
+        self._session.mount("https://", adapter)
+
+        # Fan-out pool for map_get; the token bucket still caps the overall rate
+        self._executor = ThreadPoolExecutor(max_workers=MAP_WORKERS, thread_name_prefix="sleeper-get")
+
+        # Responses for the endpoints in HTTP_CACHE_TTLS; None disables caching
+        self._cache = ResponseCache(cache_path) if cache_path else None
+        if self._cache:
+            self._cache.prune(max(HTTP_CACHE_TTLS.values()))
+
+        # _memo_get results: endpoint -> (time fetched, response), in LRU order
+        self._memo: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+        # Requests currently on the wire: endpoint -> Future shared by every caller
+        self._inflight: dict[str, Future[Any]] = {}
+        self._inflight_lock = threading.Lock()
+
+        # Players already loaded this process: cache path -> (fetch time, players)
+        self._players_cache: dict[Path, tuple[float, dict[str, dict[str, Any]]]] = {}
+
+    def __enter__(self) -> SleeperAPI:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the fan-out pool and close pooled HTTP connections and the response cache."""
+        self._executor.shutdown()
+        self._session.close()
+        if self._cache:
+            self._cache.close()
 
     def _rate_limit(self) -> None:
-        """Ensure we don't exceed rate limits."""
-        elapsed = time.time() - self._last_call_time
-        if elapsed < self.sleep_s:
-            time.sleep(self.sleep_s - elapsed)
-        self._last_call_time = time.time()
+        """
+        Ensure we don't exceed rate limits (token bucket, safe across threads).
+
+        Callers take a token under the lock; when the bucket is empty the
+        balance goes negative to reserve a future token, and the caller sleeps
+        outside the lock until it has refilled.
+        """
+        with self._rate_lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._rate)
+            self._last_refill = now
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+    def _drain_tokens(self) -> None:
+        """Empty the token bucket so every caller backs off after a 429."""
+        with self._rate_lock:
+            self._tokens = min(self._tokens, 0)
 
     def _get(self, endpoint: str, timeout: int = 30) -> Any:
-        """Make a GET request to the Sleeper API."""
-        self._rate_limit()
+        """
+        Make a GET request to the Sleeper API.
+
+        Concurrent calls for the same endpoint share one request (and one
+        rate-limit token): the first caller fetches, the rest wait for its
+        result or exception. Treat results as read-only, since they may be shared.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(endpoint)
+            leader = future is None
+            if leader:
+                future = self._inflight[endpoint] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(self._fetch(endpoint, timeout))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[endpoint]
+        return future.result()
+
+    def _fetch(self, endpoint: str, timeout: int) -> Any:
+        """
+        Fetch and decode one endpoint for _get.
+
+        Endpoints listed in HTTP_CACHE_TTLS are answered from the response
+        cache while fresh, without spending a rate-limit token.
+        """
         url = f"{BASE}{endpoint}"
-        resp = requests.get(url, timeout=timeout)
+        ttl = _cache_ttl(endpoint) if self._cache else None
+        if ttl:
+            body = self._cache.get(url, ttl)
+            if body is not None:
+                return json.loads(body)
+
+        resp = self._request(endpoint, timeout)
+        if ttl:
+            self._cache.set(url, resp.content)
+        # json.loads detects UTF-8 on raw bytes itself; resp.json() would first
+        # guess the encoding and build an intermediate str of the whole body
+        return json.loads(resp.content)
+
+    def _request(self, endpoint: str, timeout: int = 30, headers: dict[str, str] | None = None) -> requests.Response:
+        """
+        Send one rate-limited GET and return the response (which may be a 304).
+
+        429 and 5xx responses are retried up to MAX_ATTEMPTS times, waiting for
+        Retry-After when the server sends it and exponential backoff otherwise.
+        Other 4xx responses raise requests.HTTPError.
+        """
+        url = f"{BASE}{endpoint}"
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self._rate_limit()
+            resp = self._session.get(url, timeout=timeout, headers=headers)
+            if resp.status_code not in RETRY_STATUSES or attempt == MAX_ATTEMPTS:
+                break
+            if resp.status_code == 429:
+                self._drain_tokens()
+            time.sleep(_retry_delay(resp, attempt))
+
         if resp.status_code == 429:
-            raise RuntimeError(f"Rate limited (429) on {endpoint}. Slow down.")
+            raise RuntimeError(f"Rate limited (429) on {endpoint} after {MAX_ATTEMPTS} attempts. Slow down.")
         resp.raise_for_status()
-        return resp.json()
+        return resp
 
-    def get_user(self, username: str) -> dict[str, Any] | None:
+    def bust(self, endpoint: str) -> None:
+        """Drop any cached response for `endpoint` so the next call refetches it."""
+        if self._cache:
+            self._cache.delete(f"{BASE}{endpoint}")
+
+    def _memo_get(self, endpoint: str, force_refresh: bool = False) -> Any:
+        """_get, reusing a response from the last MEMO_TTL seconds. Treat results as read-only."""
+        now = time.monotonic()
+        if not force_refresh:
+            with self._memo_lock:
+                hit = self._memo.get(endpoint)
+                if hit is not None and now - hit[0] < MEMO_TTL:
+                    self._memo.move_to_end(endpoint)
+                    return hit[1]
+
+        result = self._get(endpoint)
+        with self._memo_lock:
+            self._memo[endpoint] = (now, result)
+            self._memo.move_to_end(endpoint)
+            if len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return result
+
+    def map_get(self, endpoints: list[str]) -> list[Any]:
+        """GET several endpoints concurrently; results are in the same order as `endpoints`."""
+        return list(self._executor.map(self._get, endpoints))
+
+    def get_user(self, username: str, force_refresh: bool = False) -> dict[str, Any] | None:
         """Get user by username. Returns None if not found."""
         try:
-            return self._get(f"/user/{username}")
+            return self._memo_get(f"/user/{username}", force_refresh)
         except requests.HTTPError as e:
             if e.response.status_code == 404:
                 return None
@@ -58,10 +268,10 @@ class SleeperAPI:
         except requests.HTTPError:
             return []
 
-    def get_league(self, league_id: str) -> dict[str, Any] | None:
+    def get_league(self, league_id: str, force_refresh: bool = False) -> dict[str, Any] | None:
         """Get league details."""
         try:
-            return self._get(f"/league/{league_id}")
+            return self._memo_get(f"/league/{league_id}", force_refresh)
         except requests.HTTPError as e:
             if e.response.status_code == 404:
                 return None
@@ -97,26 +307,152 @@ class SleeperAPI:
         except requests.HTTPError:
             return []
 
-    def get_all_players(self, force_refresh: bool = False) -> dict[str, dict[str, Any]]:
+    def get_many_rosters(self, league_ids: list[str]) -> list[list[dict[str, Any]]]:
+        """Get rosters for several leagues concurrently, in the same order as `league_ids`."""
+        return list(self._executor.map(self.get_league_rosters, league_ids))
+
+    def get_many_brackets(self, league_ids: list[str]) -> list[list[dict[str, Any]]]:
+        """Get winners brackets for several leagues concurrently, in the same order as `league_ids`."""
+        return list(self._executor.map(self.get_winners_bracket, league_ids))
+
+    def get_all_players(self, force_refresh: bool = False, force_full: bool = False) -> dict[str, dict[str, Any]]:
         """
-        Get all NFL players. Caches locally since this is a ~5MB response.
+        Get all NFL players. Caches locally since this is a ~5MB response;
+        the cache is revalidated once it is older than PLAYERS_CACHE_TTL,
+        with an ETag/Last-Modified conditional request so an unchanged
+        catalog isn't downloaded again. Repeat calls on the same client are
+        served from memory, so treat the returned dict as read-only.
+
+        Players are trimmed to PLAYER_FIELDS unless force_full is set, which
+        returns Sleeper's complete records (cached separately in
+        players_raw.json.gz).
         
         Returns dict keyed by player_id.
         """
-        DATA_DIR.mkdir(exist_ok=True)
+        cache_path = PLAYERS_RAW_CACHE_PATH if force_full else PLAYERS_CACHE_PATH
+
+        if not force_refresh:
+            fetched_at, players = self._players_cache.get(cache_path, (0.0, None))
+            if players is not None and time.time() - fetched_at < PLAYERS_CACHE_TTL:
+                return players
+
+        if not force_refresh:
+            cached = _read_players_cache(cache_path, force_full)
+            if cached is not None:
+                self._players_cache[cache_path] = cached
+                return cached[1]
 
-        if not force_refresh and PLAYERS_CACHE_PATH.exists():
-            with open(PLAYERS_CACHE_PATH) as f:
-                return json.load(f)
+        # Ask Sleeper whether the catalog changed since the cache was written
+        resp = None
+        validators = _read_validators(cache_path)
+        if validators:
+            resp = self._request("/players/nfl", headers=validators)
+            if resp.status_code == 304:
+                os.utime(cache_path)
+                cached = _read_players_cache(cache_path, force_full)
+                if cached is not None:
+                    logger.info("Players catalog unchanged; keeping %s", cache_path)
+                    self._players_cache[cache_path] = cached
+                    return cached[1]
+                resp = None  # cache unusable after all (e.g. old schema): download in full
 
-        print("Fetching all players from Sleeper API (this is ~5MB, may take a moment)...")
-        players = self._get("/players/nfl")
+        if resp is None:
+            logger.info("Fetching all players from Sleeper API (this is ~5MB, may take a moment)...")
+            resp = self._request("/players/nfl")
+        players = json.loads(resp.content)
+        new_validators = {
+            request_header: resp.headers[response_header]
+            for response_header, request_header in (("ETag", "If-None-Match"), ("Last-Modified", "If-Modified-Since"))
+            if response_header in resp.headers
+        }
+        # Copy only the fields a player has, so absent ones stay absent rather than None
+        slim = {pid: {k: p[k] for k in PLAYER_FIELDS if k in p} for pid, p in players.items()}
 
-        with open(PLAYERS_CACHE_PATH, "w") as f:
-            json.dump(players, f)
+        if force_full:
+            # Full records repeat ~40 keys per player, so gzip shrinks them several times over
+            raw = json.dumps(players, separators=(",", ":")).encode()
+            _write_bytes(PLAYERS_RAW_CACHE_PATH, gzip.compress(raw, compresslevel=6, mtime=0))
+            _write_json(_meta_path(PLAYERS_RAW_CACHE_PATH), new_validators)
+            self._players_cache[PLAYERS_RAW_CACHE_PATH] = (time.time(), players)
+        # Pickle loads several times faster than JSON since it skips string parsing
+        _write_bytes(PLAYERS_CACHE_PATH, pickle.dumps({"version": PLAYERS_SCHEMA_VERSION, "players": slim}, protocol=5))
+        _write_json(_meta_path(PLAYERS_CACHE_PATH), new_validators)
+        LEGACY_PLAYERS_CACHE_PATH.unlink(missing_ok=True)
+        self._players_cache[PLAYERS_CACHE_PATH] = (time.time(), slim)
 
-        print(f"Cached {len(players)} players to {PLAYERS_CACHE_PATH}")
-        return players
+        logger.info("Cached %d players to %s", len(players), cache_path)
+        return players if force_full else slim
+
+
+def _read_players_cache(path: Path, full: bool) -> tuple[float, dict[str, dict[str, Any]]] | None:
+    """
+    Load a players cache file written by get_all_players.
+
+    Returns (fetch time, players), or None if the file is missing, older than
+    PLAYERS_CACHE_TTL, or (for trimmed caches) from another PLAYERS_SCHEMA_VERSION.
+    """
+    try:
+        fetched_at = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if time.time() - fetched_at >= PLAYERS_CACHE_TTL:
+        return None
+
+    # Only ever reads files this module wrote itself
+    data = path.read_bytes()
+    cached = pickle.loads(data) if path.suffix == ".pickle" else json.loads(gzip.decompress(data))
+    if full:
+        return fetched_at, cached
+    if cached.get("version") != PLAYERS_SCHEMA_VERSION:
+        return None
+    return fetched_at, cached["players"]
+
+
+def _meta_path(path: Path) -> Path:
+    """Where the HTTP validators for a players cache file are kept."""
+    return path.with_name(path.name + ".meta")
+
+
+def _read_validators(path: Path) -> dict[str, str]:
+    """
+    Get the conditional request headers (If-None-Match / If-Modified-Since)
+    saved for a players cache file, or {} if there is no usable cache to revalidate.
+    """
+    try:
+        if path.exists():
+            return json.loads(_meta_path(path).read_bytes())
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _write_bytes(path: Path, data: bytes) -> None:
+    """Write via a temp file swapped into place, so a crash never leaves a torn file."""
+    path.parent.mkdir(exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _write_json(path: Path, obj: Any) -> None:
+    """Write compact JSON atomically."""
+    _write_bytes(path, json.dumps(obj, separators=(",", ":")).encode())
+
+
+def _cache_ttl(endpoint: str) -> int | None:
+    """Seconds a response for `endpoint` may be reused, or None if it isn't cached."""
+    for suffix, ttl in HTTP_CACHE_TTLS.items():
+        if endpoint.endswith(suffix):
+            return ttl
+    return None
+
+
+def _retry_delay(resp: requests.Response, attempt: int) -> float:
+    """Seconds to wait before retrying: Retry-After if given in seconds, else 2**attempt."""
+    try:
+        return max(0.0, float(resp.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return float(2 ** attempt)
 
 
 def extract_playoff_roster_ids(bracket: list[dict[str, Any]] | None) -> set[int]:
@@ -131,9 +467,34 @@ def extract_playoff_roster_ids(bracket: list[dict[str, Any]] | None) -> set[int]
         return roster_ids
     for matchup in bracket:
         # 't1' and 't2' are the roster_ids (teams) in each matchup
-        if "t1" in matchup and matchup["t1"] is not None:
-            roster_ids.add(matchup["t1"])
-        if "t2" in matchup and matchup["t2"] is not None:
-            roster_ids.add(matchup["t2"])
+        t1 = matchup.get("t1")
+        if t1 is not None:
+            roster_ids.add(t1)
+        t2 = matchup.get("t2")
+        if t2 is not None:
+            roster_ids.add(t2)
     return roster_ids
 
+
+def extract_playoff_roster_ids_many(brackets: list[list[dict[str, Any]] | None]) -> list[set[int]]:
+    """Extract the playoff roster_ids of several winners brackets, one set per bracket."""
+    return [extract_playoff_roster_ids(bracket) for bracket in brackets]
+
+
+def players_for_rosters(
+    players: dict[str, dict[str, Any]], rosters: list[dict[str, Any]]
+) -> dict[str, dict[str, Any]]:
+    """
+    Narrow the player catalog from get_all_players to the players on `rosters`.
+
+    Code that repeatedly looks up a league's players can bind to this much
+    smaller dict instead of the full ~10k-player catalog. Player ids missing
+    from the catalog are skipped.
+    """
+    subset: dict[str, dict[str, Any]] = {}
+    for roster in rosters:
+        for player_id in roster.get("players") or []:
+            player = players.get(player_id)
+            if player is not None:
+                subset[player_id] = player
+    return subset